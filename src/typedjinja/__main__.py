@@ -1,28 +1,41 @@
 import argparse
 from pathlib import Path
 
-from typedjinja.schema import write_pyi_stub_from_template
+from typedjinja.schema import write_pyi_stubs_bulk
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Generate .pyi stub from a Jinja template with type annotations."
+        description="Generate .pyi stubs from Jinja templates with type annotations."
     )
     parser.add_argument(
-        "template",
+        "templates",
         type=Path,
-        help="Path to the Jinja template file",
+        nargs="+",
+        help="Paths to the Jinja template files",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker threads when generating multiple stubs",
     )
     args = parser.parse_args()
-    template_path = args.template
-    pycache_dir = template_path.parent / "__pycache__"
-    pycache_dir.mkdir(exist_ok=True)
-    output_path = pycache_dir / (template_path.stem + ".pyi")
-    try:
-        write_pyi_stub_from_template(template_path, output_path)
-        print(f"Stub written to {output_path}")
-    except ValueError as e:
-        print(f"Error: {e}")
+    pairs: list[tuple[Path, Path]] = []
+    for template_path in args.templates:
+        pycache_dir = template_path.parent / "__pycache__"
+        pycache_dir.mkdir(exist_ok=True)
+        output_path = pycache_dir / (template_path.stem + ".pyi")
+        pairs.append((template_path, output_path))
+    results = write_pyi_stubs_bulk(pairs, max_workers=args.jobs)
+    failed = False
+    for (template_path, output_path), error in zip(pairs, results):
+        if error is None:
+            print(f"Stub written to {output_path}")
+        else:
+            print(f"Error: {template_path}: {error}")
+            failed = True
+    if failed:
         exit(1)
 
 
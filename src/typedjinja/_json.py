@@ -0,0 +1,15 @@
+"""
+JSON serialization for the LSP/jedi bridge.
+
+Uses orjson when available: it serializes in C and returns bytes
+directly, skipping the str build + encode of the stdlib path. Falls
+back to the stdlib json module when orjson is not installed.
+"""
+
+try:
+    from orjson import dumps
+except ImportError:
+    import json
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
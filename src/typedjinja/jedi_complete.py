@@ -1,10 +1,11 @@
-import json
 import os
 import sys
 import traceback
 
 import jedi
 
+from typedjinja._json import dumps as json_dumps
+
 
 def main():
     try:
@@ -31,18 +32,19 @@ def main():
                     }
                     for p in sig.params
                 ]
-                print(json.dumps(params))
+                sys.stdout.buffer.write(json_dumps(params) + b"\n")
             else:
-                print(json.dumps([]))
+                sys.stdout.buffer.write(b"[]\n")
         else:
             completions = script.complete(line, column)
-            print(
-                json.dumps(
+            sys.stdout.buffer.write(
+                json_dumps(
                     [
                         {"name": c.name, "type": c.type, "docstring": c.docstring()}
                         for c in completions
                     ]
                 )
+                + b"\n"
             )
     except Exception:
         print("JEDI_ERROR:" + traceback.format_exc(), file=sys.stderr)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Long-running worker that serves lsp_server requests over stdio.
+
+Reads Content-Length framed JSON requests (LSP style) from stdin and
+writes framed JSON responses to stdout. Clients spawn one worker per
+project and keep it alive, so interpreter startup and the jedi import
+are paid once per session instead of once per keystroke.
+
+Each request is an object {"id", "mode", "path_or_stub", ...} mirroring
+the positional arguments of lsp_server.main; the response is
+{"id", "result"} or {"id", "error"}.
+"""
+
+import json
+import sys
+import traceback
+
+from typedjinja._json import dumps as json_dumps
+from typedjinja.lsp_server import handle_request, prewarm_jedi
+
+# Jedi is known to accumulate memory and inference state in long-lived
+# processes; exit after this many requests so the client respawns us.
+MAX_REQUESTS = 1000
+
+
+def _read_message(stream) -> dict | None:
+    content_length = None
+    while True:
+        header = stream.readline()
+        if not header:
+            return None  # EOF: client went away
+        header = header.strip()
+        if not header:
+            break  # blank line ends the headers
+        name, _, value = header.partition(b":")
+        if name.strip().lower() == b"content-length":
+            content_length = int(value.strip())
+    if content_length is None:
+        return None
+    body = stream.read(content_length)
+    if len(body) < content_length:
+        return None
+    return json.loads(body)
+
+
+def _write_message(stream, payload: dict) -> None:
+    body = json_dumps(payload)
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(body))
+    stream.write(body)
+    stream.flush()
+
+
+def main():
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    prewarm_jedi()
+    for _ in range(MAX_REQUESTS):
+        request = _read_message(stdin)
+        if request is None:
+            break
+        response: dict = {"id": request.get("id")}
+        try:
+            response["result"] = handle_request(
+                request["mode"],
+                request["path_or_stub"],
+                request.get("expr_or_macro_name"),
+                request.get("line", 0),
+                request.get("column", 0),
+                request.get("template_file_path"),
+            )
+        except Exception:
+            response["error"] = traceback.format_exc()
+        _write_message(stdout, response)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,205 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import re
+import sys
+from collections import OrderedDict
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import jedi
-import tree_sitter_jinja
-from tree_sitter import Language, Parser
-
+from typedjinja._json import dumps as json_dumps
 from typedjinja.parser import parse_macro_blocks, parse_types_block
 
-JINJA_LANGUAGE = Language(tree_sitter_jinja.language())
-parser = Parser(JINJA_LANGUAGE)
+if TYPE_CHECKING:
+    import jedi
 
+# jedi and tree-sitter are imported lazily inside the helpers that need
+# them: hover and macro modes are served from the stub/template text
+# alone, and a one-shot hover invocation should not pay the several
+# hundred milliseconds of importing jedi (and loading the tree-sitter
+# grammar) at module import time.
+_ts_parser = None
 
-def parse_stub(stub: str) -> dict[str, dict[str, str | None]]:
-    out = {}
-    for line in stub.splitlines():
-        m = re.match(r"^([A-Za-z_][A-Za-z0-9_]*)\s*:\s*([^#]+?)(?:\s*#\s*(.*))?$", line)
+
+def _get_ts_parser():
+    global _ts_parser
+    if _ts_parser is None:
+        import tree_sitter_jinja
+        from tree_sitter import Language, Parser
+
+        _ts_parser = Parser(Language(tree_sitter_jinja.language()))
+    return _ts_parser
+
+
+_STUB_LINE_RE = re.compile(
+    r"^([A-Za-z_][A-Za-z0-9_]*)\s*:\s*([^#]+?)(?:\s*#\s*(.*))?$"
+)
+
+
+def _classify_stub(
+    stub: str,
+) -> tuple[list[str], list[str], dict[str, dict[str, str | None]]]:
+    """
+    Classify every stub line in a single pass.
+    Returns (imports, vars_, hover_map):
+    - imports: import/from lines, verbatim
+    - vars_: variable declaration lines with trailing comments stripped
+    - hover_map: variable name -> {type, doc} for hover lookups
+    """
+    imports: list[str] = []
+    vars_: list[str] = []
+    hover_map: dict[str, dict[str, str | None]] = {}
+    # Bind the hot callables once; the loop body then runs almost entirely
+    # in C (regex match, startswith, append) with minimal name lookups.
+    match_decl = _STUB_LINE_RE.match
+    add_import = imports.append
+    add_var = vars_.append
+    for raw in stub.splitlines():
+        line = raw.strip()
+        # One deterministic switch per line: blank and comment lines exit
+        # on the first character before any startswith runs.
+        if not line or line[0] == "#":
+            continue
+        if line.startswith(("import ", "from ")):
+            add_import(line)
+            continue
+        if ":" not in line:
+            continue  # neither import nor declaration; nothing to feed jedi
+        m = match_decl(line)
         if m:
             name, typ, doc = m.group(1), m.group(2).strip(), m.group(3)
-            out[name] = {"type": typ, "doc": doc.strip() if doc else None}
-    return out
+            hover_map[name] = {"type": typ, "doc": doc.strip() if doc else None}
+        add_var(line.split("#", 1)[0].strip())
+    return imports, vars_, hover_map
 
 
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument(
-        "mode",
-        choices=[
-            "complete",
-            "signature",
-            "hover",
-            "diagnostics",
-            "find_macro_definition",
-            "definition",
-            "context",
-            "hover_macro",
-        ],
-    )
-    p.add_argument("path_or_stub")
-    p.add_argument("expr_or_macro_name", nargs="?")
-    p.add_argument("line", type=int, nargs="?", default=0)
-    p.add_argument("column", type=int, nargs="?", default=0)
-    p.add_argument("template_file_path", nargs="?")
-    args = p.parse_args()
+def parse_stub(stub: str) -> dict[str, dict[str, str | None]]:
+    return _classify_stub(stub)[2]
+
+
+# Classified stubs keyed by path; entries are invalidated when the file's
+# (mtime_ns, size) changes. Mainly pays off in the persistent worker,
+# where the same stub is re-read on every keystroke. Alongside the line
+# buckets, the joined imports+vars prefix of the generated jedi code is
+# cached too: while the user types through one expression only the final
+# target line changes, so per request we append one line to the prefix
+# instead of re-joining the full list.
+_stub_cache: dict[
+    str,
+    tuple[
+        int,
+        int,
+        tuple[list[str], list[str], dict[str, dict[str, str | None]], str],
+    ],
+] = {}
+
+
+def _read_stub_classified(
+    stub_path: Path,
+) -> tuple[list[str], list[str], dict[str, dict[str, str | None]], str, int]:
+    """
+    Read and classify a stub file, reusing the cached classification while
+    the file on disk is unchanged.
+    Returns (imports, vars_, hover_map, code_prefix, mtime_ns), where
+    code_prefix is the newline-joined imports + vars_.
+    """
+    stat = stub_path.stat()
+    key = str(stub_path)
+    cached = _stub_cache.get(key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        imports, vars_, hover_map, prefix = cached[2]
+    else:
+        imports, vars_, hover_map = _classify_stub(
+            stub_path.read_text(encoding="utf-8")
+        )
+        prefix = "\n".join(imports + vars_)
+        _stub_cache[key] = (
+            stat.st_mtime_ns,
+            stat.st_size,
+            (imports, vars_, hover_map, prefix),
+        )
+    return imports, vars_, hover_map, prefix, stat.st_mtime_ns
+
+
+# Without an explicit project/environment, every jedi.Script construction
+# re-discovers both (a sys.path scan plus an interpreter subprocess probe).
+# Build the environment once per process and one project per stub
+# directory, lazily so non-jedi modes never pay for it. The project must
+# be discovered from the stub, not the worker's cwd: the editor spawns
+# the worker from an arbitrary directory, and project-local imports in
+# @types blocks only resolve when jedi walks up from the stub itself.
+_jedi_env = None
+_jedi_projects: dict[str, "jedi.Project"] = {}
+
+
+def _get_jedi_context(stub_path: Path):
+    global _jedi_env
+    import jedi
+
+    if _jedi_env is None:
+        _jedi_env = jedi.get_default_environment()
+    key = str(stub_path.parent)
+    project = _jedi_projects.get(key)
+    if project is None:
+        project = jedi.get_default_project(str(stub_path))
+        _jedi_projects[key] = project
+    return _jedi_env, project
 
-    if args.mode == "find_macro_definition":
-        template_to_scan = args.path_or_stub
-        macro_to_find = args.expr_or_macro_name
+
+def prewarm_jedi() -> None:
+    """
+    Run a throwaway completion so jedi's lazy caches (environment probe,
+    grammar, typeshed) are populated before the first real request.
+    """
+    global _jedi_env
+    import jedi
+
+    if _jedi_env is None:
+        _jedi_env = jedi.get_default_environment()
+    try:
+        jedi.Script("x = 1", environment=_jedi_env).complete(1, 5)
+    except Exception:
+        pass
+
+
+# jedi.Script construction re-parses the source each time; keep a small
+# LRU of Scripts keyed by (stub path, stub mtime, generated code).
+_SCRIPT_CACHE_MAX = 32
+_script_cache: OrderedDict[tuple[str, int, str], "jedi.Script"] = OrderedDict()
+
+
+def _get_script(code: str, stub_path: Path, mtime_ns: int) -> "jedi.Script":
+    key = (str(stub_path), mtime_ns, code)
+    script = _script_cache.get(key)
+    if script is None:
+        import jedi
+
+        env, project = _get_jedi_context(stub_path)
+        script = jedi.Script(
+            code, path=str(stub_path), project=project, environment=env
+        )
+        _script_cache[key] = script
+    else:
+        _script_cache.move_to_end(key)
+    while len(_script_cache) > _SCRIPT_CACHE_MAX:
+        _script_cache.popitem(last=False)
+    return script
+
+
+def handle_request(
+    mode: str,
+    path_or_stub: str,
+    expr_or_macro_name: str | None = None,
+    line: int = 0,
+    column: int = 0,
+    template_file_path: str | None = None,
+):
+    """
+    Handle a single LSP helper request and return a JSON-serializable result.
+    Shared by the one-shot CLI (main) and the persistent worker (jedi_server).
+    """
+    if mode == "find_macro_definition":
+        template_to_scan = path_or_stub
+        macro_to_find = expr_or_macro_name
         definition_location = {}
         try:
             content = Path(template_to_scan).read_text(encoding="utf-8")
@@ -62,40 +213,33 @@ def main():
                     match = macro_def_pattern.search(content)
                     if match:
                         start_offset = match.start()
-                        line = content[:start_offset].count("\n")
-                        col = start_offset - (content.rfind("\n", 0, start_offset) + 1)
+                        def_line = content[:start_offset].count("\n")
+                        def_col = start_offset - (
+                            content.rfind("\n", 0, start_offset) + 1
+                        )
                         definition_location = {
                             "file_path": template_to_scan,
-                            "line": line,
-                            "col": col,
+                            "line": def_line,
+                            "col": def_col,
                         }
                         break
         except Exception as e:
             pass
-        print(json.dumps(definition_location))
-        return
+        return definition_location
 
-    if args.mode == "definition":
+    if mode == "definition":
         # Use Jedi to find definitions of a name in the stub context
-        stub_path = Path(args.path_or_stub)
-        stub = stub_path.read_text(encoding="utf-8")
-        name = args.expr_or_macro_name
+        stub_path = Path(path_or_stub)
+        name = expr_or_macro_name
         # Build code for Jedi: imports + stub vars + assignment
-        imports_from_stub = [
-            l for l in stub.splitlines() if l.startswith(("import ", "from "))
-        ]
-        vars_from_stub = [
-            l.split("#")[0].strip()
-            for l in stub.splitlines()
-            if ":" in l and not l.startswith(("import", "from"))
-        ]
-        code_for_jedi = "\n".join(
-            imports_from_stub + vars_from_stub + [f"__typedjinja_target__ = {name}"]
+        imports_from_stub, vars_from_stub, _, code_prefix, stub_mtime_ns = (
+            _read_stub_classified(stub_path)
         )
-        code_lines = code_for_jedi.split("\n")
-        line_num = len(code_lines)
-        col_num = len(code_lines[-1])
-        script = jedi.Script(code_for_jedi, path=str(stub_path))
+        last_line = f"__typedjinja_target__ = {name}"
+        line_num = len(imports_from_stub) + len(vars_from_stub) + 1
+        col_num = len(last_line)
+        code_for_jedi = code_prefix + "\n" + last_line if code_prefix else last_line
+        script = _get_script(code_for_jedi, stub_path, stub_mtime_ns)
         definitions: list[dict[str, int | str]] = []
         stub_resolved = stub_path.resolve()
         try:
@@ -122,34 +266,33 @@ def main():
         except Exception:
             pass
         # Return only Jedi-based definitions (no stub fallbacks)
-        print(json.dumps(definitions))
-        return
+        return definitions
 
-    if args.mode == "context":
-        template_path = Path(args.path_or_stub)
+    if mode == "context":
+        template_path = Path(path_or_stub)
         content = template_path.read_text(encoding="utf-8")
         code_bytes = content.encode("utf-8")
-        tree = parser.parse(code_bytes)
-        point = (args.line - 1, args.column)
+        tree = _get_ts_parser().parse(code_bytes)
+        point = (line - 1, column)
         # Get the node at the cursor position, fallback to root
         node = tree.root_node.descendant_for_point_range(point, point) or tree.root_node
         start_byte, end_byte = node.start_byte, node.end_byte
         node_text = code_bytes[start_byte:end_byte].decode("utf-8")
-        result = {"expr": node_text, "partial": "", "inFnArgs": False}
-        print(json.dumps(result))
-        return
+        return {"expr": node_text, "partial": "", "inFnArgs": False}
 
-    stub_path = Path(args.path_or_stub)
-    stub = stub_path.read_text()
+    stub_path = Path(path_or_stub)
+    imports_from_stub, vars_from_stub, hover_map, code_prefix, stub_mtime_ns = (
+        _read_stub_classified(stub_path)
+    )
 
-    if args.mode == "hover":
-        info = parse_stub(stub).get(args.expr_or_macro_name, {})
+    if mode == "hover":
+        info = hover_map.get(expr_or_macro_name, {})
         if not info or not info.get("type"):
             # Try to get macro info from the template_file_path if provided
             # This part primarily helps for macros defined in the SAME file,
             # or if template_file_path happens to be the source of an imported macro (less likely setup from client)
             template_for_macros_path_str = (
-                args.template_file_path
+                template_file_path
             )  # Use the explicitly passed template_file_path
 
             if template_for_macros_path_str:
@@ -168,17 +311,16 @@ def main():
 
             macros = parse_macro_blocks(template_content)
             for macro in macros:
-                if macro.get("name") == args.expr_or_macro_name:
+                if macro.get("name") == expr_or_macro_name:
                     params = macro.get("params") or ""
                     doc = macro.get("docstring") or ""
-                    info = {"type": f"{args.expr_or_macro_name}({params})", "doc": doc}
+                    info = {"type": f"{expr_or_macro_name}({params})", "doc": doc}
                     break
-        print(json.dumps(info))
-        return
+        return info
 
-    if args.mode == "hover_macro":
-        source_template_path = Path(args.path_or_stub)
-        macro_name_to_find = args.expr_or_macro_name
+    if mode == "hover_macro":
+        source_template_path = Path(path_or_stub)
+        macro_name_to_find = expr_or_macro_name
         info = {}
         try:
             template_content = source_template_path.read_text(encoding="utf-8")
@@ -191,11 +333,10 @@ def main():
                     break
         except Exception:  # pylint: disable=broad-except
             pass  # Errors here (e.g. file not found) should result in empty info
-        print(json.dumps(info))
-        return
+        return info
 
-    if args.mode == "diagnostics":
-        template_to_diagnose = Path(args.template_file_path or args.path_or_stub)
+    if mode == "diagnostics":
+        template_to_diagnose = Path(template_file_path or path_or_stub)
         content = template_to_diagnose.read_text(encoding="utf-8")
         imports, annotations, malformed = parse_types_block(content)
         diagnostics = []
@@ -249,34 +390,24 @@ def main():
                         "end_col": end_col,
                     }
                 )
-        print(json.dumps(diagnostics))
-        return
-
-    expr_text = args.expr_or_macro_name
-
-    imports_from_stub = [
-        l for l in stub.splitlines() if l.startswith(("import ", "from "))
-    ]
-    vars_from_stub = [
-        l.split("#")[0].strip()
-        for l in stub.splitlines()
-        if ":" in l and not l.startswith(("import", "from"))
-    ]
-
-    code_for_jedi = "\n".join(
-        imports_from_stub
-        + vars_from_stub
-        + [
-            f"__typedjinja_target__ = {expr_text}{'.' if args.mode=='complete' else '('}"
-        ]
+        return diagnostics
+
+    expr_text = expr_or_macro_name
+    resolve_name = None
+    if mode == "resolve":
+        # Item id is "<expr>.<name>" as assembled from a prior completion
+        expr_text, _, resolve_name = (expr_or_macro_name or "").rpartition(".")
+
+    last_line = (
+        f"__typedjinja_target__ = {expr_text}{'(' if mode == 'signature' else '.'}"
     )
-    code_lines = code_for_jedi.split("\n")
-    line_num = len(code_lines)
-    col_num = len(code_lines[-1])
-    script = jedi.Script(code_for_jedi, path=str(stub_path))
+    line_num = len(imports_from_stub) + len(vars_from_stub) + 1
+    col_num = len(last_line)
+    code_for_jedi = code_prefix + "\n" + last_line if code_prefix else last_line
+    script = _get_script(code_for_jedi, stub_path, stub_mtime_ns)
 
     try:
-        if args.mode == "signature":
+        if mode == "signature":
             sigs = script.get_signatures(line_num, col_num)
             res = []
             if sigs:
@@ -293,19 +424,52 @@ def main():
                             "docstring": sig.docstring(),
                         }
                     )
-            print(json.dumps(res))
-        else:
-            comps = script.complete(line_num, col_num)
-            print(
-                json.dumps(
-                    [
-                        {"name": c.name, "type": c.type, "docstring": c.docstring()}
-                        for c in comps
-                    ]
-                )
-            )
+            return res
+        comps = script.complete(line_num, col_num)
+        if mode == "resolve":
+            # Run the expensive docstring inference for one item only
+            for c in comps:
+                if c.name == resolve_name:
+                    return {"name": resolve_name, "docstring": c.docstring()}
+            return {}
+        # Docstrings are deliberately omitted from the list: c.docstring()
+        # can re-run inference per item; clients fetch it via 'resolve'.
+        return [{"name": c.name, "type": c.type} for c in comps]
     except Exception:
-        print("[]")
+        return {} if mode == "resolve" else []
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument(
+        "mode",
+        choices=[
+            "complete",
+            "signature",
+            "resolve",
+            "hover",
+            "diagnostics",
+            "find_macro_definition",
+            "definition",
+            "context",
+            "hover_macro",
+        ],
+    )
+    p.add_argument("path_or_stub")
+    p.add_argument("expr_or_macro_name", nargs="?")
+    p.add_argument("line", type=int, nargs="?", default=0)
+    p.add_argument("column", type=int, nargs="?", default=0)
+    p.add_argument("template_file_path", nargs="?")
+    args = p.parse_args()
+    result = handle_request(
+        args.mode,
+        args.path_or_stub,
+        args.expr_or_macro_name,
+        args.line,
+        args.column,
+        args.template_file_path,
+    )
+    sys.stdout.buffer.write(json_dumps(result) + b"\n")
 
 
 if __name__ == "__main__":
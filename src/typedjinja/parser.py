@@ -1,5 +1,31 @@
+import functools
 import re
 
+# Compiled once at import time; these run on every template parse.
+_TYPES_RE = re.compile(r"\{#[-+]?\s*@types(.*?)#[-+]?\}", re.DOTALL)
+_MACRO_RE = re.compile(r"\{#[-+]?\s*@typedmacro(.*?)#[-+]?\}", re.DOTALL)
+
+# Classifies every line of a @types block in one C-level scan; the branch
+# taken per line is read off m.lastgroup. Order matters: comments, imports
+# and docstrings must win over the annotation (any line with a colon) and
+# catch-all alternatives. Blank lines match nothing and are skipped.
+_TYPES_LINE_RE = re.compile(
+    r"(?P<comment>^[ \t]*#.*$)"
+    r"|(?P<imp>^[ \t]*(?:import|from)[ \t]+\S.*$)"
+    r"|(?P<doc>^[ \t]*(?:\"\"\"|''').*$)"
+    r"|(?P<ann>^[ \t]*[^:\n]*:.*$)"
+    r"|(?P<bad>^[ \t]*\S.*$)",
+    re.MULTILINE,
+)
+
+
+def _iter_stripped_lines(block: str):
+    """Yield the stripped, non-empty lines of a block (strips each line once)."""
+    for raw in block.splitlines():
+        line = raw.strip()
+        if line:
+            yield line
+
 
 def parse_types_block(
     template_content: str,
@@ -11,30 +37,43 @@ def parse_types_block(
     - annotations: dict of variable name to type string (optionally with docstring as a tuple)
     - malformed_lines: list of lines that could not be parsed
     """
-    # Use regex to find the @types comment block (supports {# ... #}, {#- ... -#}, etc)
-    pattern = re.compile(r"\{#[-+]?\s*@types(.*?)#[-+]?\}", re.DOTALL)
-    match = pattern.search(template_content)
-    if not match:
+    # C-level substring test; most templates have no marker at all, and
+    # this skips both the DOTALL regex scan and a cache entry for them.
+    if "@types" not in template_content:
         return [], {}, []
+    imports, annotations, malformed = _parse_types_block_cached(template_content)
+    return list(imports), dict(annotations), list(malformed)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_types_block_cached(
+    template_content: str,
+) -> tuple[tuple[str, ...], tuple[tuple[str, str], ...], tuple[str, ...]]:
+    # Memoized worker; returns immutable tuples so cached values are safe
+    # to share between callers.
+    # The @types comment block supports {# ... #}, {#- ... -#}, etc
+    match = _TYPES_RE.search(template_content)
+    if not match:
+        return (), (), ()
     block = match.group(1)
     imports: list[str] = []
     annotations: dict[str, str] = {}
     malformed: list[str] = []
     docstring: str | None = None
-    for line in block.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith("#"):
+    for m in _TYPES_LINE_RE.finditer(block):
+        kind = m.lastgroup
+        if kind == "comment":
             continue  # Ignore comment lines
-        if line.startswith("import ") or line.startswith("from "):
+        line = m.group().strip()
+        if kind == "imp":
             imports.append(line)
-            continue
-        if line.startswith('"""') or line.startswith("'''"):
-            # Start of a docstring for the next variable
-            docstring = line.strip("\"' ")
-            continue
-        if ":" in line:
+        elif kind == "doc":
+            # Docstring for the next variable; only lines that open and
+            # close their triple quotes are recognized, and slicing them
+            # off beats a character-set strip on every candidate line.
+            if len(line) >= 6 and line.endswith(line[:3]):
+                docstring = line[3:-3].strip()
+        elif kind == "ann":
             var, type_ = line.split(":", 1)
             var = var.strip()
             type_ = type_.strip()
@@ -48,9 +87,9 @@ def parse_types_block(
                 docstring = None
             else:
                 annotations[var] = type_
-            continue
-        malformed.append(line)
-    return imports, annotations, malformed
+        else:  # bad
+            malformed.append(line)
+    return tuple(imports), tuple(annotations.items()), tuple(malformed)
 
 
 def parse_macro_blocks(template_content: str) -> list[dict[str, str | None]]:
@@ -58,22 +97,35 @@ def parse_macro_blocks(template_content: str) -> list[dict[str, str | None]]:
     Extract all macro annotation blocks from the template.
     Returns a list of dicts: {name, params, docstring}
     """
-    # Use regex to find all @typedmacro comment blocks
-    macro_pattern = re.compile(r"\{#[-+]?\s*@typedmacro(.*?)#[-+]?\}", re.DOTALL)
-    blocks = macro_pattern.findall(template_content)
-    macros = []
+    if "@typedmacro" not in template_content:
+        return []
+    return [
+        {"name": name, "params": params, "docstring": docstring}
+        for name, params, docstring in _parse_macro_blocks_cached(template_content)
+    ]
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_macro_blocks_cached(
+    template_content: str,
+) -> tuple[tuple[str, str, str | None], ...]:
+    # Memoized worker; returns immutable tuples so cached values are safe
+    # to share between callers.
+    # Find all @typedmacro comment blocks
+    blocks = _MACRO_RE.findall(template_content)
+    macros: list[tuple[str, str, str | None]] = []
     for block in blocks:
-        lines = [l.strip() for l in block.splitlines() if l.strip()]
+        lines = list(_iter_stripped_lines(block))
         if not lines:
             continue
         sig_line = lines[0]
         docstring = None
         if len(lines) > 1:
             docstring = " ".join(lines[1:])
-        if "(" not in sig_line or not sig_line.endswith(")"):
-            continue
-        name, rest = sig_line.split("(", 1)
+        name, sep, rest = sig_line.partition("(")
         name = name.strip()
+        if not sep or not rest.endswith(")") or not name.isidentifier():
+            continue
         params = rest[:-1]
-        macros.append({"name": name, "params": params, "docstring": docstring})
-    return macros
+        macros.append((name, params, docstring))
+    return tuple(macros)
@@ -1,3 +1,6 @@
+import os
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from typedjinja.parser import parse_macro_blocks, parse_types_block
@@ -5,9 +8,10 @@ from typedjinja.parser import parse_macro_blocks, parse_types_block
 
 def generate_pyi_stub(
     imports: list[str], annotations: dict[str, str], macros: list[dict]
-) -> str:
+) -> bytes:
     """
-    Generate a .pyi stub string from import statements, type annotations, and macro signatures.
+    Generate .pyi stub bytes from import statements, type annotations, and macro signatures.
+    Encoded to UTF-8 once here so writers can emit the bytes directly.
     """
     lines = []
     if imports:
@@ -25,8 +29,12 @@ def generate_pyi_stub(
         else:
             lines.append(f'{" " * 4}"""..."""')
 
-    print("\n".join(lines))
-    return "\n".join(lines) + "\n"
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# Generated stubs keyed by template path; entries are reused while the
+# template's mtime is unchanged, skipping the read and both parses.
+_STUB_CACHE: dict[Path, tuple[int, bytes]] = {}
 
 
 def write_pyi_stub_from_template(
@@ -38,12 +46,53 @@ def write_pyi_stub_from_template(
     """
     template_path = Path(template_path)
     pyi_path = Path(pyi_path)
-    content = template_path.read_text(encoding="utf-8")
-    imports, annotations, malformed = parse_types_block(content)
-    macros = parse_macro_blocks(content)
-    if not imports and not annotations and not macros:
-        raise ValueError("No @types or @typedmacro block found in template")
-    if malformed:
-        raise ValueError(f"Malformed type annotation lines: {malformed}")
-    stub = generate_pyi_stub(imports, annotations, macros)
-    pyi_path.write_text(stub, encoding="utf-8")
+    mtime_ns = template_path.stat().st_mtime_ns
+    cached = _STUB_CACHE.get(template_path)
+    if cached is not None and cached[0] == mtime_ns:
+        stub = cached[1]
+    else:
+        content = template_path.read_text(encoding="utf-8")
+        imports, annotations, malformed = parse_types_block(content)
+        macros = parse_macro_blocks(content)
+        if not imports and not annotations and not macros:
+            raise ValueError("No @types or @typedmacro block found in template")
+        if malformed:
+            raise ValueError(f"Malformed type annotation lines: {malformed}")
+        stub = generate_pyi_stub(imports, annotations, macros)
+        _STUB_CACHE[template_path] = (mtime_ns, stub)
+    # Only write when the stub changed: an untouched mtime on the .pyi
+    # saves downstream consumers from re-parsing it.
+    try:
+        if pyi_path.read_bytes() == stub:
+            return
+    except OSError:
+        pass
+    pyi_path.write_bytes(stub)
+
+
+def write_pyi_stubs_bulk(
+    pairs: Iterable[tuple[str | Path, str | Path]],
+    max_workers: int | None = None,
+) -> list[Exception | None]:
+    """
+    Generate .pyi stubs for many templates in parallel.
+    Each pair is (template_path, pyi_path). Returns one entry per pair:
+    None on success, or the exception raised for that template.
+    The per-template work is I/O bound (read + parse + write), so a
+    thread pool overlaps disk access with parsing and shares the
+    template/parser caches across workers.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+
+    def _generate_one(pair: tuple[str | Path, str | Path]) -> Exception | None:
+        try:
+            write_pyi_stub_from_template(*pair)
+            return None
+        except Exception as e:
+            return e
+
+    workers = max_workers or min(len(pairs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_generate_one, pairs))
@@ -18,7 +18,7 @@ import {
 import { TextDocument } from 'vscode-languageserver-textdocument';
 import * as fs from 'fs';
 import * as url from 'url';
-import { spawnSync } from 'child_process';
+import { spawn, ChildProcess } from 'child_process';
 import * as process from 'process';
 
 // Create a connection for the server
@@ -39,31 +39,146 @@ logToClient(`[TypedJinja LSP] Templates root directory: ${TEMPLATES_ROOT}`);
 // Create a simple text document manager
 const documents: TextDocuments<TextDocument> = new TextDocuments(TextDocument);
 
+// ---------------------------------------------------------------------------
+// Persistent Python worker (typedjinja.jedi_server)
+//
+// One long-lived worker per LSP server; requests are Content-Length framed
+// JSON over stdio, so interpreter startup and the jedi import are paid once
+// per session instead of once per request. The worker exits on its own after
+// MAX_REQUESTS handled requests (jedi memory growth mitigation) and is
+// respawned lazily on the next request.
+// ---------------------------------------------------------------------------
+let worker: ChildProcess | null = null;
+let workerBuffer = Buffer.alloc(0);
+let nextRequestId = 1;
+interface PendingRequest {
+  payload: Record<string, unknown>;
+  resolve: (value: any) => void;
+  reject: (err: Error) => void;
+  retried: boolean;
+}
+const pendingRequests = new Map<number, PendingRequest>();
+
+function startWorker(): ChildProcess {
+  const pythonExec = process.env.PYTHON_PATH || 'python3';
+  logToClient(`[Worker] Spawning: ${pythonExec} -m typedjinja.jedi_server`);
+  const child = spawn(pythonExec, ['-m', 'typedjinja.jedi_server'], {
+    stdio: ['pipe', 'pipe', 'pipe'],
+  });
+  workerBuffer = Buffer.alloc(0);
+  child.stdout!.on('data', (chunk: Buffer) => {
+    workerBuffer = Buffer.concat([workerBuffer, chunk]);
+    drainWorkerBuffer();
+  });
+  child.stderr!.on('data', (chunk: Buffer) => {
+    logToClient(`[Worker stderr] ${chunk.toString('utf8').trim()}`);
+  });
+  // A request can race the worker's scheduled exit at MAX_REQUESTS; an
+  // unhandled EPIPE on stdin would take down the whole LSP server.
+  child.stdin!.on('error', (err: Error) => {
+    logToClient(`[Worker stdin ERROR] ${err}`);
+  });
+  let goneHandled = false;
+  const onGone = (reason: string) => {
+    if (goneHandled) return;
+    goneHandled = true;
+    logToClient(`[Worker] ${reason}`);
+    if (worker === child) worker = null;
+    const interrupted = Array.from(pendingRequests.values());
+    pendingRequests.clear();
+    for (const pending of interrupted) {
+      if (pending.retried) {
+        pending.reject(new Error(`worker unavailable (${reason})`));
+      } else {
+        // The exit at MAX_REQUESTS is routine; resend in-flight
+        // requests once on a fresh worker instead of failing them.
+        pending.retried = true;
+        pendingRequests.set(pending.payload.id as number, pending);
+        sendToWorker(pending.payload);
+      }
+    }
+  };
+  child.on('exit', code => onGone(`exited with code ${code}`));
+  child.on('error', err => onGone(`spawn error: ${err}`));
+  return child;
+}
+
+function sendToWorker(payload: Record<string, unknown>) {
+  if (!worker) {
+    worker = startWorker();
+  }
+  const body = Buffer.from(JSON.stringify(payload), 'utf8');
+  worker.stdin!.write(`Content-Length: ${body.length}\r\n\r\n`);
+  worker.stdin!.write(body);
+}
+
+function drainWorkerBuffer() {
+  for (;;) {
+    const headerEnd = workerBuffer.indexOf('\r\n\r\n');
+    if (headerEnd === -1) return;
+    const header = workerBuffer.slice(0, headerEnd).toString('utf8');
+    const lengthMatch = header.match(/Content-Length:\s*(\d+)/i);
+    if (!lengthMatch) {
+      workerBuffer = workerBuffer.slice(headerEnd + 4);
+      continue;
+    }
+    const length = parseInt(lengthMatch[1], 10);
+    if (workerBuffer.length < headerEnd + 4 + length) return;
+    const body = workerBuffer.slice(headerEnd + 4, headerEnd + 4 + length).toString('utf8');
+    workerBuffer = workerBuffer.slice(headerEnd + 4 + length);
+    let response: { id?: number; result?: any; error?: string };
+    try {
+      response = JSON.parse(body);
+    } catch (e) {
+      logToClient(`[Worker Parse ERROR] ${body}`);
+      continue;
+    }
+    const pending = response.id !== undefined ? pendingRequests.get(response.id) : undefined;
+    if (!pending) continue;
+    pendingRequests.delete(response.id!);
+    if (response.error !== undefined) {
+      pending.reject(new Error(response.error));
+    } else {
+      pending.resolve(response.result);
+    }
+  }
+}
+
+function workerRequest(
+  mode: string,
+  pathOrStub: string,
+  exprOrMacroName?: string,
+  line?: number,
+  column?: number,
+  templateFilePath?: string
+): Promise<any> {
+  const id = nextRequestId++;
+  const payload = {
+    id,
+    mode,
+    path_or_stub: pathOrStub,
+    expr_or_macro_name: exprOrMacroName ?? null,
+    line: line ?? 0,
+    column: column ?? 0,
+    template_file_path: templateFilePath ?? null,
+  };
+  return new Promise((resolve, reject) => {
+    pendingRequests.set(id, { payload, resolve, reject, retried: false });
+    sendToWorker(payload);
+  });
+}
+
 // Extract base expr/partial via Python LSP context
-function getExprAndPartialAttr(
+async function getExprAndPartialAttr(
   doc: TextDocument,
   position: { line: number; character: number }
-): { expr: string; partial: string; inFnArgs?: boolean } | null {
+): Promise<{ expr: string; partial: string; inFnArgs?: boolean } | null> {
   const templatePath = url.fileURLToPath(doc.uri);
-  const pythonExec = process.env.PYTHON_PATH || 'python3';
-  const args = [
-    '-m',
-    'typedjinja.lsp_server',
-    'context',
-    templatePath,
-    String(position.line + 1),
-    String(position.character),
-  ];
-  logToClient(`[Context] Invoking: ${pythonExec} ${args.join(' ')}`);
-  const result = spawnSync(pythonExec, args, { encoding: 'utf8' });
-  if (result.error || result.stderr) {
-    logToClient(`[Context ERROR] ${result.error ?? result.stderr}`);
-    return null;
-  }
+  logToClient(`[Context] Requesting context at L${position.line + 1}C${position.character}`);
   try {
-    return JSON.parse(result.stdout);
+    return await workerRequest('context', templatePath, undefined, position.line + 1, position.character);
   } catch (e) {
-    logToClient(`[Context Parse ERROR] ${result.stdout}`);
+    logToClient(`[Context ERROR] ${e}`);
     return null;
   }
 }
@@ -131,7 +246,7 @@ connection.onInitialize((_params: InitializeParams): InitializeResult => {
   return {
     capabilities: {
       textDocumentSync: TextDocumentSyncKind.Incremental,
-      completionProvider: { resolveProvider: false },
+      completionProvider: { resolveProvider: true },
       hoverProvider: true,
       definitionProvider: true,
     },
@@ -162,7 +277,7 @@ connection.onCompletion(
     }
 
     const pos = textDocumentPosition.position;
-    const ctx = getExprAndPartialAttr(doc, pos);
+    const ctx = await getExprAndPartialAttr(doc, pos);
     if (!ctx) {
       logToClient('No context for completions, falling back to top-level variables');
       // Fallback: parse stub for top-level variables
@@ -177,30 +292,13 @@ connection.onCompletion(
 
     const { expr, partial, inFnArgs } = ctx;
     logToClient(`Expr='${expr}' partial='${partial}' inFnArgs=${inFnArgs}`);
-    const pythonExec = process.env.PYTHON_PATH || 'python3';
     const mode = inFnArgs ? 'signature' : 'complete';
-    const args = inFnArgs
-      ? ['-m', 'typedjinja.lsp_server', mode, stubPath, expr, String(pos.line + 1), String(pos.character)]
-      : ['-m', 'typedjinja.lsp_server', mode, stubPath, expr, String(pos.line + 1), String(pos.character)];
-    // Debug: log the CLI invocation
-    logToClient(`[CLI] Invoking: ${pythonExec} ${mode} stub at expr: ${expr}`);
-    logToClient(`[CLI] Args: ${args.join(' ')}`);
-    const result = spawnSync(pythonExec, args, { encoding: 'utf8' });
-    logToClient(`[CLI] stdout: ${result.stdout}`);
-    logToClient(`[CLI] stderr: ${result.stderr}`);
-    if (result.error) {
-      logToClient(`[ERROR] ${result.error}`);
-      return [];
-    }
-    if (result.stderr) {
-      logToClient(`[ERROR] ${result.stderr}`);
-    }
-
+    logToClient(`[Worker] Requesting ${mode} for expr: ${expr}`);
     let items: any[];
     try {
-      items = JSON.parse(result.stdout);
+      items = await workerRequest(mode, stubPath, expr, pos.line + 1, pos.character);
     } catch (e) {
-      logToClient(`[ERROR] Failed to parse completions: ${result.stdout}`);
+      logToClient(`[ERROR] ${e}`);
       return [];
     }
 
@@ -222,32 +320,41 @@ connection.onCompletion(
       documentation: item.docstring
         ? { kind: MarkupKind.Markdown, value: item.docstring }
         : undefined,
-      sortText: `${item.name.startsWith('_') ? '1_' : '0_'}${item.name}`
+      sortText: `${item.name.startsWith('_') ? '1_' : '0_'}${item.name}`,
+      // Docstrings are fetched lazily via completionItem/resolve
+      data: inFnArgs ? undefined : { stubPath, id: `${expr}.${item.name}` },
     }));
   }
 );
 
-// Utility: Lookup a macro definition by name via Python LSP CLI
-function findMacroDefinitionByName(doc: TextDocument, macroName: string): { node: any } | null {
-  const templatePath = url.fileURLToPath(doc.uri);
-  const pythonExec = process.env.PYTHON_PATH || 'python3';
-  const result = spawnSync(
-    pythonExec,
-    ['-m', 'typedjinja.lsp_server', 'find_macro_definition', templatePath, macroName],
-    { encoding: 'utf8' }
-  );
-  if (result.error || result.stderr) {
-    logToClient(`[MacroDef ERROR] ${result.error ?? result.stderr}`);
-    return null;
+// Lazily fetch the docstring for the selected completion item
+connection.onCompletionResolve(
+  async (item: CompletionItem): Promise<CompletionItem> => {
+    const data = item.data as { stubPath: string; id: string } | undefined;
+    if (!data || item.documentation) return item;
+    try {
+      const info = await workerRequest('resolve', data.stubPath, data.id);
+      if (info?.docstring) {
+        item.documentation = { kind: MarkupKind.Markdown, value: info.docstring };
+      }
+    } catch (e) {
+      logToClient(`[Resolve ERROR] ${e}`);
+    }
+    return item;
   }
+);
+
+// Utility: Lookup a macro definition by name via the Python worker
+async function findMacroDefinitionByName(doc: TextDocument, macroName: string): Promise<{ node: any } | null> {
+  const templatePath = url.fileURLToPath(doc.uri);
   let def;
   try {
-    def = JSON.parse(result.stdout);
+    def = await workerRequest('find_macro_definition', templatePath, macroName);
   } catch (e) {
-    logToClient(`[MacroDef Parse ERROR] ${result.stdout}`);
+    logToClient(`[MacroDef ERROR] ${e}`);
     return null;
   }
-  if (!def.file_path) {
+  if (!def || !def.file_path) {
     return null;
   }
   const node = {
@@ -352,16 +459,11 @@ connection.onDefinition(
           return p.join(dir, '__pycache__', base + '.pyi');
         })();
         if (fs.existsSync(stubPath)) {
-            const pythonExec = process.env.PYTHON_PATH || 'python3';
-            const result = spawnSync(pythonExec, ['-m', 'typedjinja.lsp_server', 'definition', stubPath, currentWordInTypesBlock], { encoding: 'utf8' });
-            if (!result.error && result.stdout && result.stdout.trim() !== '') {
-                try {
-                    const defs: any[] = JSON.parse(result.stdout);
-                    const locs = defs.map(d => ({ uri: url.pathToFileURL(d.file_path).toString(), range: Range.create(d.line, d.col, d.end_line, d.end_col) }));
-                    if (locs.length > 0) { logToClient('[Definition @types] Found.'); return locs; }
-                } catch (e) { logToClient(`[Definition @types Parse ERROR] ${result.stdout}`); }
-            } else if (result.error) { logToClient(`[Definition @types ERROR] ${result.error}`); }
-             else if (result.stderr && result.stderr.trim() !== '') { logToClient(`[Definition @types STDERR] ${result.stderr}`); }
+            try {
+                const defs: any[] = await workerRequest('definition', stubPath, currentWordInTypesBlock);
+                const locs = defs.map(d => ({ uri: url.pathToFileURL(d.file_path).toString(), range: Range.create(d.line, d.col, d.end_line, d.end_col) }));
+                if (locs.length > 0) { logToClient('[Definition @types] Found.'); return locs; }
+            } catch (e) { logToClient(`[Definition @types ERROR] ${e}`); }
         }
       }
     } // End @types block handling
@@ -398,7 +500,7 @@ connection.onDefinition(
             targetUri = targetDoc.uri;
           } catch (e) { logToClient(`[Definition MacroCallImport ERROR] ${e}`); return null; }
         }
-        const macroDef = findMacroDefinitionByName(targetDoc, macroName);
+        const macroDef = await findMacroDefinitionByName(targetDoc, macroName);
         if (macroDef?.node) {
           const { startPosition, endPosition } = macroDef.node;
           logToClient(`[Definition MacroCall] Found definition for '${macroName}'.`);
@@ -429,7 +531,7 @@ connection.onDefinition(
           const fileText = fs.readFileSync(targetTemplateFsPath, 'utf8');
           const targetUri = url.pathToFileURL(targetTemplateFsPath).toString();
           const targetDocForImport = TextDocument.create(targetUri, 'jinja', 1, fileText); // Use new var name
-          const macroDef = findMacroDefinitionByName(targetDocForImport, wordAtCursor);
+          const macroDef = await findMacroDefinitionByName(targetDocForImport, wordAtCursor);
           if (macroDef?.node) {
             const { startPosition, endPosition } = macroDef.node;
             logToClient(`[Definition FallbackImportSuccess] Jumping to '${wordAtCursor}' in '${sourceFileForImportedWord}'`);
@@ -444,7 +546,7 @@ connection.onDefinition(
       
       // Path 4: If FallbackImport didn't return, try SameFileFallback (still within if(wordAtCursor) block)
       logToClient(`[Definition SameFileFallback] Checking if '${wordAtCursor}' is a macro in the current file: ${doc.uri}`);
-      const macroDef = findMacroDefinitionByName(doc, wordAtCursor);
+      const macroDef = await findMacroDefinitionByName(doc, wordAtCursor);
       if (macroDef?.node) {
           const { startPosition, endPosition } = macroDef.node;
           logToClient(`[Definition SameFileFallback] Found '${wordAtCursor}' in current file.`);
@@ -464,13 +566,11 @@ connection.onHover(
     const doc = documents.get(_params.textDocument.uri);
     if (!doc) return null;
 
-    const pythonExec = process.env.PYTHON_PATH || 'python3';
     const word = getWordAt(doc, _params.position);
     logToClient(`[Hover Debug Word] '${word}'`);
     if (!word) return null;
 
     const templatePath = url.fileURLToPath(doc.uri);
-    let result;
     let info: { type?: string; doc?: string } = {};
 
     const defContext = getDefinitionContext(doc, _params.position); // For actual call sites
@@ -486,18 +586,11 @@ connection.onHover(
         const path = require('path');
         const absoluteSourcePath = path.resolve(TEMPLATES_ROOT, defContext.sourceTemplate);
         logToClient(`[HoverImportedMacroCall] Looking for macro '${word}' in source '${absoluteSourcePath}'`);
-        const args = ['-m', 'typedjinja.lsp_server', 'hover_macro', absoluteSourcePath, word];
-        logToClient(`[HoverImportedMacroCall] Invoking: ${pythonExec} ${args.join(' ')}`);
-        result = spawnSync(pythonExec, args, { encoding: 'utf8' });
-        if (result.error || result.stderr) {
-          logToClient(`[HoverImportedMacroCall ERROR] ${result.error ?? result.stderr}`);
-        } else {
-          try {
-            info = JSON.parse(result.stdout);
-            performedImportedMacroHover = true;
-          } catch {
-            logToClient(`[HoverImportedMacroCall Parse ERROR] ${result.stdout}`);
-          }
+        try {
+          info = await workerRequest('hover_macro', absoluteSourcePath, word);
+          performedImportedMacroHover = true;
+        } catch (e) {
+          logToClient(`[HoverImportedMacroCall ERROR] ${e}`);
         }
       }
     }
@@ -527,18 +620,11 @@ connection.onHover(
           const path = require('path');
           const absoluteSourcePath = path.resolve(TEMPLATES_ROOT, sourceTemplateForWord);
           logToClient(`[HoverImportedName] Word '${matchedImportedName}' is imported from '${absoluteSourcePath}'`);
-          const args = ['-m', 'typedjinja.lsp_server', 'hover_macro', absoluteSourcePath, matchedImportedName];
-          logToClient(`[HoverImportedName] Invoking: ${pythonExec} ${args.join(' ')}`);
-          result = spawnSync(pythonExec, args, { encoding: 'utf8' });
-          if (result.error || result.stderr) {
-            logToClient(`[HoverImportedName ERROR] ${result.error ?? result.stderr}`);
-          } else {
-            try {
-              info = JSON.parse(result.stdout);
-              performedImportedMacroHover = true;
-            } catch (e) {
-              logToClient(`[HoverImportedName Parse ERROR] ${result.stdout}`);
-            }
+          try {
+            info = await workerRequest('hover_macro', absoluteSourcePath, matchedImportedName);
+            performedImportedMacroHover = true;
+          } catch (e) {
+            logToClient(`[HoverImportedName ERROR] ${e}`);
           }
         }
       }
@@ -560,19 +646,11 @@ connection.onHover(
     if (fs.existsSync(stubPath)) {
       const line = _params.position.line;
       const character = _params.position.character;
-      const args = ['-m', 'typedjinja.lsp_server', 'hover', stubPath, word, String(line), String(character), templatePath];
-      logToClient(`[HoverDefault] Invoking: ${pythonExec} ${args.join(' ')}`);
-      result = spawnSync(pythonExec, args, { encoding: 'utf8' });
-      if (result.error) {
-        logToClient(`[HoverDefault ERROR] ${result.error}`);
-      } else if (result.stderr && result.stderr.trim() !== '') {
-        logToClient(`[HoverDefault STDERR] ${result.stderr}`);
-      } else if (result.stdout) {
-        try {
-          info = JSON.parse(result.stdout);
-        } catch (e) {
-          logToClient(`[HoverDefault Parse ERROR] ${result.stdout}`);
-        }
+      logToClient(`[HoverDefault] Requesting hover for '${word}'`);
+      try {
+        info = await workerRequest('hover', stubPath, word, line, character, templatePath);
+      } catch (e) {
+        logToClient(`[HoverDefault ERROR] ${e}`);
       }
     } else {
       logToClient(`[HoverDefault] Stub path ${stubPath} does not exist. Skipping default hover.`);
@@ -604,25 +682,13 @@ async function runDiagnostics(doc: TextDocument) {
     connection.sendDiagnostics({ uri: doc.uri, diagnostics: [] });
     return;
   }
-  const pythonExec = process.env.PYTHON_PATH || 'python3';
-  logToClient(`[Diagnostics] Running: ${pythonExec} -m typedjinja.lsp_server diagnostics ...`);
-  const result = spawnSync(
-    pythonExec,
-    ['-m', 'typedjinja.lsp_server', 'diagnostics', stubPath, '', '0', '0', templatePath],
-    { encoding: 'utf8' }
-  );
-  if (result.error) {
-    logToClient(`[Diagnostics ERROR] ${result.error}`);
-    return;
-  }
-  logToClient(`[Diagnostics] Raw stdout: ${result.stdout}`);
-  logToClient(`[Diagnostics] Raw stderr: ${result.stderr}`);
+  logToClient(`[Diagnostics] Requesting diagnostics for: ${templatePath}`);
   let diagnostics = [];
   try {
-    diagnostics = JSON.parse(result.stdout);
+    diagnostics = await workerRequest('diagnostics', stubPath, '', 0, 0, templatePath);
   } catch (e) {
-    logToClient(`[Diagnostics Parse Error] ${result.stdout}`);
-    diagnostics = [];
+    logToClient(`[Diagnostics ERROR] ${e}`);
+    return;
   }
   logToClient(`[Diagnostics] Final diagnostics: ${JSON.stringify(diagnostics)}`);
   connection.sendDiagnostics({
@@ -680,6 +746,14 @@ connection.onDidChangeWatchedFiles((params) => {
   }
 });
 
+// Kill the Python worker when the LSP session ends
+connection.onShutdown(() => {
+  if (worker) {
+    worker.kill();
+    worker = null;
+  }
+});
+
 // Start listening
 documents.listen(connection);
 connection.listen();
\ No newline at end of file